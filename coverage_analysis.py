@@ -5,10 +5,24 @@ from folium import plugins
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import gaussian_kde
-from operator_distances import load_data, haversine_distance
+from scipy.spatial import cKDTree
+from itertools import combinations
+import argparse
+from operator_distances import load_data, iter_data_chunks
+from distances import nearest_distances, nearest_neighbour_distances, unit_vectors, EARTH_RADIUS_KM, DEFAULT_METHOD
+from tiling import tiled_kde, tiled_nearest_distances, chunked_quantiles, check_backend, BACKENDS, BLOCK_ROWS
+from tile_export import export_coverage_tiles
 import os
 from tqdm import tqdm
 
+# Region shared by the grid-based analyses (lat/lon in degrees)
+ANALYSIS_BOUNDS = {
+    'lat_min': 47,
+    'lat_max': 49.5,
+    'lon_min': 1,
+    'lon_max': 4.5
+}
+
 def create_operator_map(data, operator, output_dir='outputs'):
     """Create an interactive map for a specific operator's antennas."""
     # Filter data for operator
@@ -41,21 +55,27 @@ def create_operator_map(data, operator, output_dir='outputs'):
     # Save map
     m.save(os.path.join(output_dir, f'coverage_map_{operator.lower().replace(" ", "_")}.html'))
 
-def create_density_heatmap(data, output_dir='outputs'):
-    """Create a static heatmap showing antenna density across France."""
-    plt.figure(figsize=(15, 10))
+def create_density_heatmap(data, output_dir='outputs', backend='memory', **tiled_options):
+    """
+    Create a static heatmap showing antenna density across France.
+    
+    backend: 'memory' uses scipy's gaussian_kde. 'tiled' evaluates the same
+        density out-of-core with tiling.tiled_kde, in which case data may also
+        be an iterable of chunks from iter_data_chunks and each map shows the
+        mean density per grid cell instead of every antenna.
+    """
+    check_backend(backend)
+    
+    if backend == 'tiled':
+        for operator, points in tiled_kde(data, **tiled_options).items():
+            plot_density_grid(points, operator, output_dir)
+        return
     
-    # France boundaries
-    france_bounds = {
-        'lat_min': 47,
-        'lat_max': 49.5,
-        'lon_min': 1,
-        'lon_max': 4.5
-    }
+    plt.figure(figsize=(15, 10))
     
     # Create grid for density calculation
-    xmin, xmax = france_bounds['lon_min'], france_bounds['lon_max']
-    ymin, ymax = france_bounds['lat_min'], france_bounds['lat_max']
+    xmin, xmax = ANALYSIS_BOUNDS['lon_min'], ANALYSIS_BOUNDS['lon_max']
+    ymin, ymax = ANALYSIS_BOUNDS['lat_min'], ANALYSIS_BOUNDS['lat_max']
     
     # Calculate density for each operator
     for operator in data['Exploitant'].unique():
@@ -89,18 +109,50 @@ def create_density_heatmap(data, output_dir='outputs'):
         plt.savefig(os.path.join(output_dir, f'density_map_{operator.lower().replace(" ", "_")}.png'))
         plt.close()
 
+def plot_density_grid(points, operator, output_dir='outputs', bins=200):
+    """
+    Plot the mean antenna density per grid cell for one operator.
+    
+    points: (n, 3) array of latitude, longitude and density, as returned by
+        tiling.tiled_kde. It is read in blocks, so it may be a memmap larger
+        than memory.
+    """
+    lat_edges = np.linspace(ANALYSIS_BOUNDS['lat_min'], ANALYSIS_BOUNDS['lat_max'], bins + 1)
+    lon_edges = np.linspace(ANALYSIS_BOUNDS['lon_min'], ANALYSIS_BOUNDS['lon_max'], bins + 1)
+    total = np.zeros((bins, bins))
+    count = np.zeros((bins, bins))
+    
+    for start in range(0, len(points), BLOCK_ROWS):
+        block = np.asarray(points[start:start + BLOCK_ROWS])
+        total += np.histogram2d(block[:, 0], block[:, 1], bins=[lat_edges, lon_edges], weights=block[:, 2])[0]
+        count += np.histogram2d(block[:, 0], block[:, 1], bins=[lat_edges, lon_edges])[0]
+    
+    mean_density = np.ma.masked_where(count == 0, total / np.maximum(count, 1))
+    
+    plt.figure(figsize=(15, 10))
+    plt.imshow(
+        mean_density,
+        extent=[ANALYSIS_BOUNDS['lon_min'], ANALYSIS_BOUNDS['lon_max'],
+               ANALYSIS_BOUNDS['lat_min'], ANALYSIS_BOUNDS['lat_max']],
+        origin='lower',
+        cmap='viridis',
+        aspect='auto'
+    )
+    plt.colorbar(label='Antenna Density')
+    
+    plt.title(f'Antenna Density - {operator}')
+    plt.xlabel('Longitude')
+    plt.ylabel('Latitude')
+    
+    # Save plot
+    plt.savefig(os.path.join(output_dir, f'density_map_{operator.lower().replace(" ", "_")}.png'))
+    plt.close()
+
 def identify_low_coverage_areas(data, grid_size=0.5, threshold_percentile=10, output_dir='outputs'):
     """Identify areas with low antenna coverage."""
-    # Create grid over France
-    france_bounds = {
-        'lat_min': 47,
-        'lat_max': 49.5,
-        'lon_min': 1,
-        'lon_max': 4.5
-    }
-    
-    lon_edges = np.arange(france_bounds['lon_min'], france_bounds['lon_max'], grid_size)
-    lat_edges = np.arange(france_bounds['lat_min'], france_bounds['lat_max'], grid_size)
+    # Create grid over the analysis region
+    lon_edges = np.arange(ANALYSIS_BOUNDS['lon_min'], ANALYSIS_BOUNDS['lon_max'], grid_size)
+    lat_edges = np.arange(ANALYSIS_BOUNDS['lat_min'], ANALYSIS_BOUNDS['lat_max'], grid_size)
     
     for operator in data['Exploitant'].unique():
         plt.figure(figsize=(15, 10))
@@ -120,8 +172,8 @@ def identify_low_coverage_areas(data, grid_size=0.5, threshold_percentile=10, ou
         # Plot
         plt.imshow(
             low_coverage,
-            extent=[france_bounds['lon_min'], france_bounds['lon_max'],
-                   france_bounds['lat_min'], france_bounds['lat_max']],
+            extent=[ANALYSIS_BOUNDS['lon_min'], ANALYSIS_BOUNDS['lon_max'],
+                   ANALYSIS_BOUNDS['lat_min'], ANALYSIS_BOUNDS['lat_max']],
             origin='lower',
             cmap='Reds_r',
             aspect='auto'
@@ -136,28 +188,38 @@ def identify_low_coverage_areas(data, grid_size=0.5, threshold_percentile=10, ou
         plt.savefig(os.path.join(output_dir, f'low_coverage_{operator.lower().replace(" ", "_")}.png'))
         plt.close()
 
-def create_comparative_analysis(data, output_dir='outputs'):
-    """Create comparative visualizations of coverage between operators."""
+def create_comparative_analysis(data, output_dir='outputs', method=DEFAULT_METHOD,
+                                backend='memory', **tiled_options):
+    """
+    Create comparative visualizations of coverage between operators.
+    
+    backend: 'memory' computes nearest distances in RAM. 'tiled' uses
+        tiling.tiled_nearest_distances, in which case data may also be an
+        iterable of chunks from iter_data_chunks and the box plot is drawn
+        from streamed quantiles.
+    """
+    check_backend(backend)
+    
+    if backend == 'tiled':
+        nearest = tiled_nearest_distances(data, method=method, **tiled_options)
+        plot_distance_boxes(nearest, output_dir)
+        return
+    
     # Prepare data for box plot
     distances_by_operator = []
     operators = []
     
     for operator in data['Exploitant'].unique():
         operator_data = data[data['Exploitant'] == operator]
-        coords = operator_data[['Latitude', 'Longitude']].values
-        
-        # Calculate distances to nearest antenna for each point
-        for i in range(len(coords)):
-            current = coords[i]
-            others = np.delete(coords, i, axis=0)
-            if len(others) > 0:
-                distances = np.array([
-                    haversine_distance(current[0], current[1], other[0], other[1])
-                    for other in others
-                ])
-                min_distance = np.min(distances)
-                distances_by_operator.append(min_distance)
-                operators.append(operator)
+        if len(operator_data) < 2:
+            continue
+        
+        # Distance to nearest antenna for each point
+        distances = nearest_neighbour_distances(
+            operator_data['Latitude'].values, operator_data['Longitude'].values, method=method
+        )
+        distances_by_operator.extend(distances)
+        operators.extend([operator] * len(distances))
     
     # Create box plot
     plt.figure(figsize=(12, 6))
@@ -170,11 +232,167 @@ def create_comparative_analysis(data, output_dir='outputs'):
     plt.savefig(os.path.join(output_dir, 'distance_distribution_comparison.png'))
     plt.close()
 
-def main():
+def build_analysis_grid(bounds=ANALYSIS_BOUNDS, grid_size=0.01):
+    """
+    Build a regular lat/lon grid of cell centers over the analysis region.
+    
+    Returns:
+        tuple: (lat_centers, lon_centers, cell_area)
+            - lat_centers, lon_centers: 1D arrays of cell center coordinates
+            - cell_area: 2D array (lat x lon) of cell areas in km²
+    """
+    lat_centers = np.arange(bounds['lat_min'], bounds['lat_max'], grid_size) + grid_size / 2
+    lon_centers = np.arange(bounds['lon_min'], bounds['lon_max'], grid_size) + grid_size / 2
+    
+    # Cell area shrinks with the cosine of the latitude
+    row_area = (np.radians(grid_size) * EARTH_RADIUS_KM) ** 2 * np.cos(np.radians(lat_centers))
+    cell_area = np.repeat(row_area[:, None], len(lon_centers), axis=1)
+    
+    return lat_centers, lon_centers, cell_area
+
+def rasterize_nearest_distances(data, lat_centers, lon_centers, method=DEFAULT_METHOD):
+    """
+    Rasterize the distance to the nearest antenna of each operator on a shared grid.
+    
+    Each operator is processed once: a KD-tree over its antennas finds
+    candidate nearest antennas for every grid cell, which are re-ranked with
+    the requested accuracy (see distances.nearest_distances).
+    
+    Returns:
+        tuple: (operators, rasters)
+            - operators: Sorted list of operator names
+            - rasters: float32 array (operator x lat x lon) of distances in km
+    """
+    grid_lon, grid_lat = np.meshgrid(lon_centers, lat_centers)
+    
+    operators = sorted(data['Exploitant'].unique())
+    rasters = np.empty((len(operators), len(lat_centers), len(lon_centers)), dtype=np.float32)
+    
+    for k, operator in enumerate(tqdm(operators, desc="Rasterizing operators")):
+        operator_data = data[data['Exploitant'] == operator]
+        lat = operator_data['Latitude'].values
+        lon = operator_data['Longitude'].values
+        
+        tree = cKDTree(unit_vectors(lat, lon))
+        distances, _ = nearest_distances(
+            tree, lat, lon, grid_lat.ravel(), grid_lon.ravel(), method=method
+        )
+        rasters[k] = distances.reshape(grid_lat.shape)
+    
+    return operators, rasters
+
+def plot_distance_boxes(nearest, output_dir='outputs'):
+    """
+    Box plot of nearest-antenna distances per operator from streamed quantiles.
+    
+    nearest: {operator: (n, 3) array of latitude, longitude and distance}, as
+        returned by tiling.tiled_nearest_distances. Arrays are read in blocks.
+    """
+    stats = []
+    for operator, points in nearest.items():
+        q0, q1, median, q3, q4 = chunked_quantiles(points[:, 2], [0, 0.25, 0.5, 0.75, 1])
+        if np.isnan(median):
+            continue
+        iqr = q3 - q1
+        stats.append({
+            'label': operator,
+            'med': median,
+            'q1': q1,
+            'q3': q3,
+            'whislo': max(q0, q1 - 1.5 * iqr),
+            'whishi': min(q4, q3 + 1.5 * iqr),
+            'fliers': [],
+        })
+    
+    plt.figure(figsize=(12, 6))
+    plt.gca().bxp(stats, showfliers=False)
+    plt.title('Distribution of Distances to Nearest Antenna by Operator')
+    plt.xlabel('Operator')
+    plt.ylabel('Distance to Nearest Antenna (km)')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, 'distance_distribution_comparison.png'))
+    plt.close()
+
+def compare_operator_coverage(data, coverage_radius_km=2.0, grid_size=0.01,
+                              output_dir='outputs', method=DEFAULT_METHOD):
+    """
+    Compare coverage between every pair of operators on a shared grid.
+    
+    A cell is covered by an operator when its nearest antenna is within
+    coverage_radius_km. Overlap and exclusive areas for all pairs are derived
+    from the coverage masks with a single matrix product.
+    
+    Writes:
+        - operator_coverage_rasters.npz: distance rasters (float32) and a
+          bitmask raster where bit k is set if operator k covers the cell
+        - operator_coverage_comparison.csv: pairwise overlap/exclusive areas
+    
+    Returns:
+        pandas.DataFrame: The pairwise summary table.
+    """
+    lat_centers, lon_centers, cell_area = build_analysis_grid(grid_size=grid_size)
+    operators, rasters = rasterize_nearest_distances(data, lat_centers, lon_centers, method=method)
+    
+    # Coverage masks flattened to (operator x cell), weighted by cell area
+    covered = (rasters <= coverage_radius_km).reshape(len(operators), -1)
+    weighted = covered * cell_area.ravel()
+    
+    # overlap[a, b] = area covered by both a and b
+    overlap = weighted @ covered.T.astype(weighted.dtype)
+    covered_area = np.diag(overlap)
+    
+    summary = pd.DataFrame([
+        {
+            'operator_a': operators[a],
+            'operator_b': operators[b],
+            'overlap_km2': overlap[a, b],
+            'a_only_km2': covered_area[a] - overlap[a, b],
+            'b_only_km2': covered_area[b] - overlap[a, b],
+        }
+        for a, b in combinations(range(len(operators)), 2)
+    ])
+    
+    # Pack the per-operator masks into one compact bitmask raster
+    bits_dtype = np.min_scalar_type(2 ** len(operators) - 1)
+    bits = (1 << np.arange(len(operators))).astype(bits_dtype)
+    coverage_bits = (bits @ covered.astype(bits_dtype)).reshape(rasters.shape[1:])
+    
+    os.makedirs(output_dir, exist_ok=True)
+    np.savez_compressed(
+        os.path.join(output_dir, 'operator_coverage_rasters.npz'),
+        operators=np.array(operators),
+        lat_centers=lat_centers,
+        lon_centers=lon_centers,
+        distances=rasters,
+        coverage_bits=coverage_bits,
+        coverage_radius_km=coverage_radius_km
+    )
+    summary.to_csv(os.path.join(output_dir, 'operator_coverage_comparison.csv'), index=False)
+    
+    return summary
+
+def main(backend='memory'):
+    check_backend(backend)
+    
     # Create output directory
     output_dir = 'outputs'
     os.makedirs(output_dir, exist_ok=True)
     
+    if backend == 'tiled':
+        # Only the stages with an out-of-core implementation run, each
+        # streaming the antenna file in chunks and spilling its results to disk
+        spill_dir = os.path.join(output_dir, 'spill')
+        
+        print("\nCreating density heatmaps...")
+        create_density_heatmap(iter_data_chunks(), output_dir, backend='tiled', spill_dir=spill_dir)
+        
+        print("\nCreating comparative analysis...")
+        create_comparative_analysis(iter_data_chunks(), output_dir, backend='tiled', spill_dir=spill_dir)
+        
+        print("\nAnalysis complete! Check the 'outputs' directory for results.")
+        return
+    
     # Load data
     print("Loading data...")
     data = load_data()
@@ -196,7 +414,19 @@ def main():
     print("\nCreating comparative analysis...")
     create_comparative_analysis(data, output_dir)
     
+    # Compare coverage between operators
+    print("\nComparing coverage between operators...")
+    summary = compare_operator_coverage(data, output_dir=output_dir)
+    print(summary.to_string(index=False))
+    export_coverage_tiles(
+        os.path.join(output_dir, 'operator_coverage_rasters.npz'),
+        os.path.join(output_dir, 'tiles', 'coverage')
+    )
+    
     print("\nAnalysis complete! Check the 'outputs' directory for results.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze antenna coverage by operator.")
+    parser.add_argument('--backend', choices=BACKENDS, default='memory',
+                        help="'tiled' runs the out-of-core stages on datasets larger than memory")
+    main(parser.parse_args().backend) 
\ No newline at end of file
@@ -5,6 +5,7 @@ import numpy as np
 from scipy.spatial import ConvexHull
 import matplotlib.pyplot as plt
 import seaborn as sns
+from tile_export import export_antenna_tiles
 
 def load_data(antennas_path='data/antennas.csv', locations_path='data/locations.csv'):
     """Load and merge the antenna and location data."""
@@ -38,7 +39,7 @@ def create_coverage_map(data):
     m = folium.Map(location=[46.2276, 2.2137], zoom_start=6)
     
     # Create a heatmap layer
-    heat_data = [[row['Latitude'], row['Longitude']] for _, row in data.iterrows()]
+    heat_data = data[['Latitude', 'Longitude']].values.tolist()
     plugins.HeatMap(heat_data, radius=15).add_to(m)
     
     # Calculate the convex hull of all points to show coverage boundary
@@ -168,6 +169,10 @@ def main():
     create_coverage_map(data)
     create_density_plot(data)
     
+    # Export tiles so external viewers can load only the visible region
+    counts = export_antenna_tiles(data)
+    print(f"Antenna tiles: {counts['written']} written, {counts['unchanged']} unchanged, {counts['removed']} removed")
+    
     # Print some statistics
     print("\nCoverage Statistics:")
     print(f"Longitude range: {data['Longitude'].min():.2f} to {data['Longitude'].max():.2f}")
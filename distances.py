@@ -0,0 +1,228 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from geopy.distance import geodesic
+
+# WGS-84 ellipsoid parameters
+WGS84_A = 6378137.0  # Semi-major axis in meters
+WGS84_F = 1 / 298.257223563  # Flattening
+WGS84_B = (1 - WGS84_F) * WGS84_A  # Semi-minor axis in meters
+
+EARTH_RADIUS_KM = 6371  # Mean Earth radius used by the spherical model
+
+DEFAULT_METHOD = 'exact'
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Calculate the Haversine distance between two points in kilometers."""
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+def lambert_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the Andoyer-Lambert distance on the WGS-84 ellipsoid in kilometers.
+
+    This is a closed-form first-order flattening correction to the spherical
+    distance, accurate to about 10 m over a few thousand kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+
+    # Reduced latitudes
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+
+    # Central angle between the reduced latitudes
+    dbeta = beta2 - beta1
+    dlon = lon2 - lon1
+    h = np.sin(dbeta/2)**2 + np.cos(beta1) * np.cos(beta2) * np.sin(dlon/2)**2
+    sigma = 2 * np.arctan2(np.sqrt(h), np.sqrt(1-h))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p)**2 * np.cos(q)**2 / np.cos(sigma/2)**2
+        y = (sigma + np.sin(sigma)) * np.cos(p)**2 * np.sin(q)**2 / np.sin(sigma/2)**2
+        distance = WGS84_A * (sigma - WGS84_F / 2 * (x + y))
+
+    # Coincident points give 0/0 in the correction terms
+    distance = np.where(sigma == 0, 0.0, distance)
+
+    return distance / 1000
+
+def vincenty_distance(lat1, lon1, lat2, lon2, tol=1e-12, max_iter=200):
+    """
+    Calculate the exact geodesic distance on the WGS-84 ellipsoid in kilometers.
+
+    Solves Vincenty's inverse problem on whole arrays at once. The few pairs
+    that do not converge (nearly antipodal points) are resolved with geopy's
+    Karney solver so every result is exact.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (lat1, lon1, lat2, lon2))
+    )
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (v.ravel() for v in (lat1, lon1, lat2, lon2))
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    L = np.radians(lon2 - lon1)
+
+    u1 = np.arctan((1 - WGS84_F) * np.tan(phi1))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(phi2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt(
+                (cos_u2 * sin_lam)**2 +
+                (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)**2
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha**2
+
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0,
+                cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha
+            )
+
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (
+                    cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                )
+            )
+
+            # Freeze pairs that have already converged
+            lam_next = np.where(converged, lam, lam_next)
+            converged |= np.abs(lam_next - lam) < tol
+            lam = lam_next
+
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m**2) -
+                B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma**2) * (-3 + 4 * cos_2sigma_m**2)
+            )
+        )
+        distance = WGS84_B * A * (sigma - delta_sigma) / 1000
+
+    distance = np.where(sin_sigma == 0, 0.0, distance)
+
+    # Fall back to the Karney solver for pairs Vincenty cannot handle.
+    # Non-finite inputs never converge; leave them as NaN like the other methods.
+    finite = np.isfinite(lat1) & np.isfinite(lon1) & np.isfinite(lat2) & np.isfinite(lon2)
+    distance[~finite] = np.nan
+    for i in np.flatnonzero(~converged & finite):
+        distance[i] = geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).kilometers
+
+    return distance.reshape(shape)
+
+def unit_vectors(lat, lon):
+    """
+    Convert coordinates to 3D unit vectors on the sphere.
+
+    Euclidean (chord) distance between unit vectors increases monotonically
+    with great-circle distance, so these can be indexed with a KD-tree for
+    nearest-neighbour queries.
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+# Sphere-nearest candidates re-ranked with the requested distance method
+NEAREST_CANDIDATES = 4
+
+def nearest_distances(tree, lat, lon, query_lat, query_lon, method=DEFAULT_METHOD, exclude=None):
+    """
+    Distance from each query point to the nearest indexed point.
+
+    The nearest point on the sphere is not always the nearest on the
+    ellipsoid, so the KD-tree returns a few candidates and the closest is
+    picked with the requested distance method.
+
+    tree: KD-tree over unit_vectors(lat, lon).
+    lat, lon: Coordinates of the indexed points.
+    query_lat, query_lon: Arrays of query coordinates.
+    exclude: Optional array giving, for each query point, an indexed point to
+        skip (typically the query point itself).
+
+    Returns:
+        tuple: (distances, indices) of the nearest indexed point. Distance is
+            inf when no candidate is left.
+    """
+    query_lat = np.asarray(query_lat, dtype=float)
+    query_lon = np.asarray(query_lon, dtype=float)
+    k = min(NEAREST_CANDIDATES + (exclude is not None), tree.n)
+    _, idx = tree.query(unit_vectors(query_lat, query_lon), k=k)
+    idx = idx.reshape(len(query_lat), k)
+
+    dists = geo_distance(
+        query_lat[:, None], query_lon[:, None], lat[idx], lon[idx],
+        method=method
+    )
+    if exclude is not None:
+        dists[idx == np.asarray(exclude)[:, None]] = np.inf
+
+    best = np.argmin(dists, axis=1)
+    rows = np.arange(len(query_lat))
+    return dists[rows, best], idx[rows, best]
+
+def nearest_neighbour_distances(lat, lon, method=DEFAULT_METHOD):
+    """
+    Distance from each point to the nearest other point of the same set.
+
+    Returns:
+        numpy.ndarray: Distances in km, inf for a point without any other point.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) == 0:
+        return np.empty(0)
+    tree = cKDTree(unit_vectors(lat, lon))
+    distances, _ = nearest_distances(tree, lat, lon, lat, lon, method=method, exclude=np.arange(len(lat)))
+    return distances
+
+DISTANCE_METHODS = {
+    'haversine': haversine_distance,
+    'ellipsoidal': lambert_distance,
+    'exact': vincenty_distance,
+}
+
+def geo_distance(lat1, lon1, lat2, lon2, method=DEFAULT_METHOD):
+    """
+    Calculate distances between arrays of points in kilometers.
+
+    lat1, lon1: Coordinates of the first points (scalars or arrays).
+    lat2, lon2: Coordinates of the second points, broadcast against the first.
+    method: One of 'haversine' (spherical), 'ellipsoidal' (Andoyer-Lambert
+        approximation) or 'exact' (Vincenty with Karney fallback).
+
+    Returns:
+        numpy.ndarray: Distances in kilometers.
+    """
+    try:
+        distance_func = DISTANCE_METHODS[method]
+    except KeyError:
+        raise ValueError(
+            f"Unknown distance method: {method}. "
+            f"Choose from {', '.join(DISTANCE_METHODS)}"
+        )
+    return distance_func(lat1, lon1, lat2, lon2)
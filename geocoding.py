@@ -0,0 +1,179 @@
+import re
+import time
+import asyncio
+import unicodedata
+
+import pandas as pd
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited
+
+# Errors worth retrying: the request may succeed a moment later
+RETRYABLE_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited, OSError)
+
+def normalize_address(address):
+    """
+    Normalize an address for lookups: uppercase, no accents or punctuation,
+    single spaces.
+    """
+    address = unicodedata.normalize('NFKD', str(address))
+    address = ''.join(c for c in address if not unicodedata.combining(c))
+    address = re.sub(r'[^A-Z0-9]+', ' ', address.upper())
+    return address.strip()
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for asyncio.
+
+    rate: Tokens added per second.
+    capacity: Maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class NominatimBackend:
+    """
+    Geocode with the Nominatim web service.
+
+    Nominatim's usage policy allows at most one request per second.
+    """
+
+    rate_limit = 1.0
+
+    def __init__(self, user_agent="antenna_locator", timeout=10):
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    async def geocode(self, address):
+        """Return (latitude, longitude) for address, or None if not found."""
+        # geopy's client is blocking, so run it in a thread to keep the loop free
+        loop = asyncio.get_running_loop()
+        location = await loop.run_in_executor(None, self.geolocator.geocode, address)
+        if location:
+            return (location.latitude, location.longitude)
+        return None
+
+class LocalBackend:
+    """
+    Geocode offline from the 'Adresse' and 'Commune' fields of a locations file.
+
+    Addresses match regardless of case, accents and punctuation, with or
+    without the postal code between the street and the commune.
+    """
+
+    rate_limit = None
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def from_csv(cls, locations_path='data/locations.csv'):
+        """Build the address index from a locations CSV file."""
+        # Postal codes are read as text to keep their leading zeros
+        locations = pd.read_csv(locations_path, delimiter=';', encoding='latin1', dtype={'Code postal': str})
+        locations = locations.dropna(subset=['Adresse', 'Commune'])
+
+        # Coordinates may use a decimal comma
+        for column in ['Longitude', 'Latitude']:
+            locations[column] = pd.to_numeric(
+                locations[column].astype(str).str.replace(',', '.'), errors='coerce'
+            )
+        locations = locations.dropna(subset=['Longitude', 'Latitude'])
+
+        index = {}
+        for address, postal_code, commune, lat, lon in zip(
+            locations['Adresse'], locations['Code postal'], locations['Commune'],
+            locations['Latitude'], locations['Longitude']
+        ):
+            keys = [f"{address} {commune}"]
+            if isinstance(postal_code, str):
+                keys.append(f"{address} {postal_code} {commune}")
+            for key in keys:
+                index.setdefault(normalize_address(key), (lat, lon))
+
+        return cls(index)
+
+    async def geocode(self, address):
+        """Return (latitude, longitude) for address, or None if not found."""
+        return self.index.get(normalize_address(address))
+
+class GeocodingPipeline:
+    """
+    Geocode many addresses concurrently.
+
+    backend: Object with an async geocode(address) method and a rate_limit
+        attribute (requests per second, or None for no limit).
+    concurrency: Maximum number of requests in flight.
+    retries: Attempts after the first one for retryable errors.
+    backoff: Initial retry delay in seconds, doubled on each attempt.
+    """
+
+    def __init__(self, backend, concurrency=8, retries=3, backoff=1.0):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(backend.rate_limit) if backend.rate_limit else None
+        self._semaphore = None
+
+    async def geocode(self, address):
+        """
+        Geocode one address with retries.
+
+        Returns:
+            tuple: (latitude, longitude), or None if the address was not found,
+                all attempts failed or the service rejected the request.
+        """
+        # Created lazily so the semaphore belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                try:
+                    return await self.backend.geocode(address)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.retries:
+                        print(f"Could not geocode address: {address} ({e})")
+                        return None
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                except GeocoderServiceError as e:
+                    # Not worth retrying, but must not fail the rest of the batch
+                    print(f"Could not geocode address: {address} ({e})")
+                    return None
+
+    async def geocode_batch(self, addresses):
+        """Geocode addresses concurrently, returning results in input order."""
+        return await asyncio.gather(*(self.geocode(address) for address in addresses))
+
+def geocode_addresses(addresses, backend=None, **pipeline_options):
+    """
+    Geocode a list of addresses from synchronous code.
+
+    backend: Geocoding backend (NominatimBackend by default).
+    pipeline_options: Passed to GeocodingPipeline (concurrency, retries, backoff).
+
+    Returns:
+        list: (latitude, longitude) tuples, or None for addresses not found.
+    """
+    pipeline = GeocodingPipeline(backend or NominatimBackend(), **pipeline_options)
+    return asyncio.run(pipeline.geocode_batch(addresses))
@@ -1,7 +1,11 @@
 import pandas as pd
+import numpy as np
 from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
 import sys
+import asyncio
+
+from distances import geo_distance, DEFAULT_METHOD
+from geocoding import GeocodingPipeline, NominatimBackend
 
 print("Starting script...")  # Debug print
 
@@ -70,17 +74,18 @@ def get_coordinates_from_address(address):
     else:
         raise ValueError(f"Could not geocode address: {address}")
 
-def calculate_distance(coord1, coord2):
+def calculate_distance(coord1, coord2, method=DEFAULT_METHOD):
     """
     Calculate the geodesic distance between two (latitude, longitude) tuples.
     
     coord1: Tuple (lat, lon) for the first location.
     coord2: Tuple (lat, lon) for the second location.
+    method: Distance accuracy ('haversine', 'ellipsoidal' or 'exact').
     
     Returns:
         float: Distance in kilometers.
     """
-    return geodesic(coord1, coord2).kilometers
+    return float(geo_distance(coord1[0], coord1[1], coord2[0], coord2[1], method=method))
 
 def normalize_exploitant(name):
     """
@@ -98,13 +103,14 @@ def normalize_exploitant(name):
     
     return mappings.get(name, name)
 
-def find_closest_antenna(parcel_coords, merged_data, target_exploitant):
+def find_closest_antenna(parcel_coords, merged_data, target_exploitant, method=DEFAULT_METHOD):
     """
     For a given parcel location and target exploitant, find the closest antenna.
     
     parcel_coords: Tuple (lat, lon) for the parcel.
     merged_data: The DataFrame containing antenna data.
     target_exploitant: String indicating which exploitant's antennas to consider.
+    method: Distance accuracy ('haversine', 'ellipsoidal' or 'exact').
     
     Returns:
         tuple: (closest_antenna_id, min_distance)
@@ -121,16 +127,52 @@ def find_closest_antenna(parcel_coords, merged_data, target_exploitant):
         print(f"\nAvailable exploitants: {', '.join(sorted(merged_data['Exploitant'].unique()))}")
         return None, None
 
-    min_distance = float('inf')
-    closest_antenna = None
-    for _, row in subset.iterrows():
-        antenna_coords = (row['Latitude'], row['Longitude'])
-        distance = calculate_distance(parcel_coords, antenna_coords)
-        if distance < min_distance:
-            min_distance = distance
-            closest_antenna = row['Numéro de support']
-    
-    return closest_antenna, min_distance
+    # Compute distances to all candidate antennas in one vectorized call
+    distances = geo_distance(
+        parcel_coords[0], parcel_coords[1],
+        subset['Latitude'].values, subset['Longitude'].values,
+        method=method
+    )
+    closest_idx = np.argmin(distances)
+    
+    return subset['Numéro de support'].iloc[closest_idx], float(distances[closest_idx])
+
+async def locate_parcels_async(addresses, merged_data, target_exploitant, backend=None, **pipeline_options):
+    """
+    Geocode parcel addresses concurrently and find the closest antenna for each.
+    
+    Each nearest-antenna query runs as soon as its address is geocoded, in a
+    worker thread, so it overlaps with the geocoding requests still waiting.
+    
+    addresses: List of parcel addresses.
+    merged_data: The DataFrame containing antenna data.
+    target_exploitant: String indicating which exploitant's antennas to consider.
+    backend: Geocoding backend (NominatimBackend by default).
+    pipeline_options: Passed to GeocodingPipeline (concurrency, retries, backoff).
+    
+    Returns:
+        list: (address, parcel_coords, closest_antenna_id, min_distance) tuples
+            in input order. Unresolved fields are None.
+    """
+    pipeline = GeocodingPipeline(backend or NominatimBackend(), **pipeline_options)
+    loop = asyncio.get_running_loop()
+    
+    async def locate(address):
+        parcel_coords = await pipeline.geocode(address)
+        if parcel_coords is None:
+            return address, None, None, None
+        closest, distance = await loop.run_in_executor(
+            None, find_closest_antenna, parcel_coords, merged_data, target_exploitant
+        )
+        return address, parcel_coords, closest, distance
+    
+    return await asyncio.gather(*(locate(address) for address in addresses))
+
+def locate_parcels(addresses, merged_data, target_exploitant, backend=None, **pipeline_options):
+    """Synchronous wrapper around locate_parcels_async."""
+    return asyncio.run(locate_parcels_async(
+        addresses, merged_data, target_exploitant, backend=backend, **pipeline_options
+    ))
 
 def main():
     print("Entering main function...")
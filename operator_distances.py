@@ -1,12 +1,16 @@
+import os
+import argparse
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
 from tqdm import tqdm
 from concurrent.futures import ProcessPoolExecutor
 import multiprocessing
 from itertools import combinations
 from collections import defaultdict
 
+from distances import nearest_neighbour_distances, DEFAULT_METHOD
+from tiling import tiled_nearest_distances, chunked_quantiles, check_backend, BACKENDS, BLOCK_ROWS
+
 def validate_coordinates(data):
     """Validate coordinate data and print statistics."""
     print("\nData Validation:")
@@ -81,52 +85,107 @@ def load_data(antennas_path='data/antennas.csv', locations_path='data/locations.
     
     return merged
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the Haversine distance between two points in kilometers."""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
+def iter_data_chunks(antennas_path='data/antennas.csv', locations_path='data/locations.csv', chunksize=500000):
+    """
+    Load and merge antenna data with locations one chunk of antennas at a time.
     
-    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
-    
-    return R * c
-
-def process_operator_chunk(args):
-    """Process a chunk of antennas for a specific operator."""
-    operator_data, chunk_size = args
-    distances = []
-    
-    # Convert to numpy array for faster operations
-    coordinates = operator_data[['Latitude', 'Longitude']].values
+    Use with the 'tiled' backend for antenna files that do not fit in memory.
+    Duplicates are only removed within each chunk.
+    """
+    locations = pd.read_csv(locations_path, delimiter=';', encoding='latin1')
+    locations = locations.rename(columns={'Numéro du support': 'Numéro de support'})
+    locations = locations[['Numéro de support', 'Longitude', 'Latitude']]
     
-    # Process each antenna
-    for i in tqdm(range(len(coordinates)), desc="Processing antennas", leave=False):
-        current_coord = coordinates[i]
-        
-        # Calculate distances to all other antennas
-        dists = haversine_distance(
-            current_coord[0], current_coord[1],
-            coordinates[:, 0], coordinates[:, 1]
-        )
+    for antennas in pd.read_csv(antennas_path, delimiter=';', encoding='latin1', chunksize=chunksize):
+        merged = pd.merge(antennas, locations, on='Numéro de support')
+        merged = merged[['Numéro de support', 'Exploitant', 'Longitude', 'Latitude']]
         
-        # Set distance to self to infinity to exclude it
-        dists[i] = np.inf
+        # Coordinates may use a decimal comma
+        for column in ['Longitude', 'Latitude']:
+            merged[column] = pd.to_numeric(
+                merged[column].astype(str).str.replace(',', '.'), errors='coerce'
+            )
         
-        # Find minimum distance to any other antenna
-        min_dist = np.min(dists)
-        if min_dist != np.inf:
-            distances.append(min_dist)
-    
-    return distances
+        merged = merged.dropna(subset=['Longitude', 'Latitude'])
+        yield merged.drop_duplicates(subset=['Latitude', 'Longitude', 'Exploitant'])
+
+def process_operator_chunk(args):
+    """Minimum distance from each antenna of one operator to its nearest other antenna."""
+    operator_data, chunk_size, method = args
+    
+    # KD-tree candidates re-ranked with the requested method (see distances.nearest_distances)
+    distances = nearest_neighbour_distances(
+        operator_data['Latitude'].values, operator_data['Longitude'].values, method=method
+    )
+    return distances[np.isfinite(distances)].tolist()
 
-def calculate_operator_distances(data):
-    """Calculate average minimum distances between antennas for each operator."""
+def summarize_distances(distances):
+    """Summary statistics of minimum distances for one operator."""
+    return {
+        'mean': np.mean(distances),
+        'median': np.median(distances),
+        'std': np.std(distances),
+        'min': np.min(distances),
+        'max': np.max(distances),
+        'count': len(distances)
+    }
+
+def summarize_spilled_distances(distances, block_rows=BLOCK_ROWS):
+    """
+    Summary statistics of minimum distances streamed from a large array.
+    
+    Non-finite values (antennas without any other antenna) are ignored. The
+    median is approximated by chunked_quantiles.
+    
+    Returns:
+        dict: Same keys as summarize_distances, or None if no value is finite.
+    """
+    count, total, total_sq = 0, 0.0, 0.0
+    low, high = np.inf, -np.inf
+    for start in range(0, len(distances), block_rows):
+        block = np.asarray(distances[start:start + block_rows])
+        block = block[np.isfinite(block)]
+        if len(block):
+            count += len(block)
+            total += block.sum()
+            total_sq += np.square(block).sum()
+            low, high = min(low, block.min()), max(high, block.max())
+    
+    if count == 0:
+        return None
+    
+    mean = total / count
+    return {
+        'mean': mean,
+        'median': chunked_quantiles(distances, [0.5], block_rows=block_rows)[0],
+        'std': np.sqrt(max(total_sq / count - mean ** 2, 0.0)),
+        'min': low,
+        'max': high,
+        'count': count
+    }
+
+def calculate_operator_distances(data, method=DEFAULT_METHOD, backend='memory', **tiled_options):
+    """
+    Calculate average minimum distances between antennas for each operator.
+    
+    backend: 'memory' processes each operator in RAM. 'tiled' uses the
+        out-of-core backend (tiling.tiled_nearest_distances), in which case
+        data may also be an iterable of chunks from iter_data_chunks and
+        tiled_options are passed through (tile_size, memory_budget_mb, spill_dir, ...).
+    """
+    check_backend(backend)
     stats = {}
     
+    if backend == 'tiled':
+        nearest = tiled_nearest_distances(data, method=method, **tiled_options)
+        for operator, points in nearest.items():
+            operator_stats = summarize_spilled_distances(points[:, 2])
+            if operator_stats is None:
+                print(f"Skipping {operator} - insufficient data")
+                continue
+            stats[operator] = operator_stats
+        return stats
+    
     # Group data by operator
     grouped = data.groupby('Exploitant')
     
@@ -137,31 +196,33 @@ def calculate_operator_distances(data):
             continue
         
         # Process all antennas for this operator
-        distances = process_operator_chunk((operator_data, len(operator_data)))
+        distances = process_operator_chunk((operator_data, len(operator_data), method))
         
         if distances:
-            stats[operator] = {
-                'mean': np.mean(distances),
-                'median': np.median(distances),
-                'std': np.std(distances),
-                'min': np.min(distances),
-                'max': np.max(distances),
-                'count': len(distances)
-            }
+            stats[operator] = summarize_distances(distances)
     
     return stats
 
-def main():
-    # Load data
-    print("Loading and merging data...")
-    merged_data = load_data()
-    
-    # Validate data
-    validate_coordinates(merged_data)
-    
-    # Calculate distances
-    print("\nCalculating minimum distances between antennas for each operator...")
-    results = calculate_operator_distances(merged_data)
+def main(backend='memory'):
+    check_backend(backend)
+    
+    if backend == 'tiled':
+        # Stream the antenna file in chunks and keep the distances on disk
+        print("Calculating minimum distances between antennas for each operator (tiled)...")
+        results = calculate_operator_distances(
+            iter_data_chunks(), backend='tiled', spill_dir=os.path.join('outputs', 'spill')
+        )
+    else:
+        # Load data
+        print("Loading and merging data...")
+        merged_data = load_data()
+        
+        # Validate data
+        validate_coordinates(merged_data)
+        
+        # Calculate distances
+        print("\nCalculating minimum distances between antennas for each operator...")
+        results = calculate_operator_distances(merged_data)
     
     # Print detailed results
     print("\nDetailed Results:")
@@ -173,4 +234,7 @@ def main():
         print(f"{operator:<30} | {stats['mean']:10.2f} | {stats['median']:10.2f} | {stats['std']:10.2f} | {stats['min']:10.2f} | {stats['max']:10.2f} | {stats['count']:8d}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Minimum distances between antennas of each operator.")
+    parser.add_argument('--backend', choices=BACKENDS, default='memory',
+                        help="'tiled' streams the data for datasets larger than memory")
+    main(parser.parse_args().backend)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coverage_analysis import build_analysis_grid, compare_operator_coverage, rasterize_nearest_distances
+from distances import geo_distance
+
+@pytest.fixture
+def antennas():
+    rng = np.random.default_rng(11)
+    # Operators clustered in different corners so they overlap only partly
+    return pd.DataFrame({
+        'Exploitant': ['ORANGE'] * 40 + ['SFR'] * 40,
+        'Latitude': np.r_[rng.uniform(47.0, 48.5, 40), rng.uniform(48.0, 49.5, 40)],
+        'Longitude': np.r_[rng.uniform(1.0, 3.0, 40), rng.uniform(2.5, 4.5, 40)],
+    })
+
+def test_rasterize_matches_brute_force(antennas):
+    lat_centers = np.arange(47.0, 49.5, 0.25) + 0.125
+    lon_centers = np.arange(1.0, 4.5, 0.25) + 0.125
+    operators, rasters = rasterize_nearest_distances(antennas, lat_centers, lon_centers)
+
+    assert operators == ['ORANGE', 'SFR']
+    grid_lon, grid_lat = np.meshgrid(lon_centers, lat_centers)
+    for operator, raster in zip(operators, rasters):
+        points = antennas[antennas['Exploitant'] == operator]
+        expected = geo_distance(
+            grid_lat[..., None], grid_lon[..., None],
+            points['Latitude'].values, points['Longitude'].values
+        ).min(axis=-1)
+        np.testing.assert_allclose(raster, expected, rtol=1e-6)
+
+def test_compare_operator_coverage_areas_and_bits(antennas, tmp_path):
+    summary = compare_operator_coverage(antennas, coverage_radius_km=15.0, grid_size=0.1, output_dir=tmp_path)
+
+    rasters = np.load(tmp_path / 'operator_coverage_rasters.npz')
+    _, _, cell_area = build_analysis_grid(grid_size=0.1)
+    orange, sfr = rasters['distances'] <= 15.0
+    assert orange.any() and sfr.any() and (orange & sfr).any() and (orange & ~sfr).any()
+
+    row = summary.iloc[0]
+    assert (row['operator_a'], row['operator_b']) == ('ORANGE', 'SFR')
+    assert row['overlap_km2'] == pytest.approx(cell_area[orange & sfr].sum())
+    assert row['a_only_km2'] == pytest.approx(cell_area[orange & ~sfr].sum())
+    assert row['b_only_km2'] == pytest.approx(cell_area[~orange & sfr].sum())
+
+    bits = rasters['coverage_bits']
+    np.testing.assert_array_equal((bits & 1) > 0, orange)
+    np.testing.assert_array_equal((bits & 2) > 0, sfr)
+    assert (tmp_path / 'operator_coverage_comparison.csv').exists()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from distances import (
+    geo_distance, haversine_distance, lambert_distance, nearest_neighbour_distances, vincenty_distance
+)
+
+# (lat1, lon1, lat2, lon2)
+PAIRS = np.array([
+    (48.8566, 2.3522, 48.8566, 2.3522),    # Coincident
+    (0.0, 0.0, 0.0, 90.0),                 # Equatorial
+    (0.0, 10.0, 0.0, -20.0),               # Equatorial, westwards
+    (43.2965, 5.3698, 50.6292, 3.0573),    # Marseille - Lille
+    (48.8566, 2.3522, 48.8606, 2.3376),    # Short hop in Paris
+    (-33.9, 18.4, 51.5, -0.1),             # Long haul
+    (10.0, 0.0, 0.0, 0.0),                 # Meridional
+])
+
+NEAR_ANTIPODAL = np.array([
+    (0.0, 0.0, 0.5, 179.7),
+    (0.0, 0.0, 0.0, 179.9),
+    (45.0, 10.0, -45.0, -170.0),
+])
+
+def reference(pairs):
+    return np.array([geodesic((a, b), (c, d)).kilometers for a, b, c, d in pairs])
+
+def test_vincenty_matches_geodesic():
+    pairs = np.vstack([PAIRS, NEAR_ANTIPODAL])
+    np.testing.assert_allclose(vincenty_distance(*pairs.T), reference(pairs), rtol=1e-10, atol=1e-9)
+
+def test_lambert_close_to_geodesic():
+    np.testing.assert_allclose(lambert_distance(*PAIRS.T), reference(PAIRS), rtol=1e-4, atol=1e-9)
+
+def test_haversine_within_spherical_error():
+    np.testing.assert_allclose(haversine_distance(*PAIRS.T), reference(PAIRS), rtol=6e-3, atol=1e-9)
+
+def test_coincident_points_are_zero():
+    for method in ('haversine', 'ellipsoidal', 'exact'):
+        assert geo_distance(48.0, 2.0, 48.0, 2.0, method=method) == 0.0
+
+def test_broadcasts_scalar_against_array():
+    lat = np.array([45.7640, 43.2965])
+    lon = np.array([4.8357, 5.3698])
+    distances = geo_distance(48.8566, 2.3522, lat, lon)
+    assert distances.shape == (2,)
+    np.testing.assert_allclose(distances, reference([(48.8566, 2.3522, a, b) for a, b in zip(lat, lon)]))
+
+@pytest.mark.parametrize('method', ['haversine', 'ellipsoidal', 'exact'])
+def test_nan_input_gives_nan(method):
+    distances = geo_distance(np.array([48.0, np.nan]), 2.0, 48.1, 2.1, method=method)
+    assert np.isfinite(distances[0])
+    assert np.isnan(distances[1])
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        geo_distance(0, 0, 1, 1, method='flat')
+
+def test_nearest_distances_matches_brute_force():
+    from scipy.spatial import cKDTree
+    from distances import nearest_distances, unit_vectors
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(42, 51, 300)
+    lon = rng.uniform(-5, 8, 300)
+    tree = cKDTree(unit_vectors(lat, lon))
+
+    distances, indices = nearest_distances(tree, lat, lon, lat, lon, exclude=np.arange(300))
+
+    brute = geo_distance(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    np.fill_diagonal(brute, np.inf)
+    np.testing.assert_allclose(distances, brute.min(axis=1))
+    assert np.all(indices != np.arange(300))
+
+def test_nearest_neighbour_distances_brute_force():
+    rng = np.random.default_rng(3)
+    lat, lon = rng.uniform(47, 49, 300), rng.uniform(1, 4, 300)
+    lat[1], lon[1] = lat[0], lon[0]
+    brute = geo_distance(lat[:, None], lon[:, None], lat[None], lon[None])
+    np.fill_diagonal(brute, np.inf)
+    np.testing.assert_allclose(nearest_neighbour_distances(lat, lon), brute.min(axis=1), rtol=1e-12)
+    assert nearest_neighbour_distances(lat[:1], lon[:1])[0] == np.inf
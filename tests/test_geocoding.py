@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+
+from geocoding import GeocodingPipeline, LocalBackend, TokenBucket, normalize_address
+from main import locate_parcels
+
+LOCATIONS = (
+    "Numéro du support;Longitude;Latitude;Adresse;Code postal;Commune\n"
+    "39047;2,3825;48,852222222222224;6, RUE DE CHANZY;75011;PARIS 11E ARRONDISSEMENT\n"
+    "38973;2.279166666666667;48.846944444444446;39-43, QUAI ANDRÉ CITROËN;75015;PARIS 15E ARRONDISSEMENT\n"
+    "40000;2.0;48.0;;75000;PARIS\n"
+    "41000;3.3;48.9;CHÂTEAU D'EAU LES DODIERS;02540;VIELS MAISONS\n"
+    "42000;3.4;48.8;1 RUE SANS CODE;;MONTMIRAIL\n"
+)
+
+class FlakyBackend:
+    """Fails with the given errors before answering."""
+
+    rate_limit = None
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def geocode(self, address):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return (48.0, 2.0)
+
+@pytest.fixture
+def backend(tmp_path):
+    path = tmp_path / 'locations.csv'
+    path.write_bytes(LOCATIONS.encode('latin1'))
+    return LocalBackend.from_csv(path)
+
+def test_normalize_address():
+    assert normalize_address(" 39-43, quai André Citroën ") == "39 43 QUAI ANDRE CITROEN"
+
+@pytest.mark.parametrize('address', [
+    "6, RUE DE CHANZY PARIS 11E ARRONDISSEMENT",
+    "6 rue de Chanzy, Paris 11e Arrondissement",
+    "6, RUE DE CHANZY 75011 PARIS 11E ARRONDISSEMENT",
+])
+def test_local_backend_matches_variants(backend, address):
+    assert asyncio.run(backend.geocode(address)) == pytest.approx((48.852222222222224, 2.3825))
+
+def test_local_backend_ignores_accents(backend):
+    found = asyncio.run(backend.geocode("39-43 quai Andre Citroen, 75015 Paris 15e arrondissement"))
+    assert found == pytest.approx((48.846944444444446, 2.279166666666667))
+
+def test_local_backend_keeps_postal_code_zeros(backend):
+    found = asyncio.run(backend.geocode("CHÂTEAU D'EAU LES DODIERS, 02540 VIELS MAISONS"))
+    assert found == pytest.approx((48.9, 3.3))
+
+def test_local_backend_missing_postal_code(backend):
+    assert asyncio.run(backend.geocode("1 rue sans code Montmirail")) == pytest.approx((48.8, 3.4))
+    assert asyncio.run(backend.geocode("1 RUE SANS CODE NAN MONTMIRAIL")) is None
+
+def test_local_backend_unknown_address(backend):
+    assert asyncio.run(backend.geocode("1 RUE INCONNUE PARIS")) is None
+    assert asyncio.run(backend.geocode("PARIS")) is None
+
+def test_retries_with_exponential_backoff(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, 'sleep', sleep)
+    flaky = FlakyBackend([GeocoderTimedOut(), GeocoderTimedOut()])
+    pipeline = GeocodingPipeline(flaky, retries=3, backoff=0.5)
+
+    assert asyncio.run(pipeline.geocode("address")) == (48.0, 2.0)
+    assert flaky.calls == 3
+    assert delays == [0.5, 1.0]
+
+def test_gives_up_after_retries(monkeypatch):
+    async def sleep(delay):
+        pass
+
+    monkeypatch.setattr(asyncio, 'sleep', sleep)
+    flaky = FlakyBackend([GeocoderTimedOut()] * 5)
+    pipeline = GeocodingPipeline(flaky, retries=2)
+
+    assert asyncio.run(pipeline.geocode("address")) is None
+    assert flaky.calls == 3
+
+def test_service_error_does_not_fail_batch():
+    flaky = FlakyBackend([GeocoderServiceError("forbidden")])
+    pipeline = GeocodingPipeline(flaky, concurrency=1)
+
+    results = asyncio.run(pipeline.geocode_batch(["first", "second"]))
+    assert results == [None, (48.0, 2.0)]
+    assert flaky.calls == 2
+
+def test_token_bucket_spacing():
+    bucket = TokenBucket(rate=20)
+
+    async def acquire_all():
+        times = []
+        for _ in range(4):
+            await bucket.acquire()
+            times.append(time.monotonic())
+        return times
+
+    times = asyncio.run(acquire_all())
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 0.045
+
+def test_locate_parcels_with_local_backend(backend):
+    antennas = pd.DataFrame({
+        'Numéro de support': [1, 2, 3],
+        'Exploitant': ['ORANGE', 'ORANGE', 'SFR'],
+        'Latitude': [48.85, 48.0, 48.8523],
+        'Longitude': [2.38, 2.0, 2.3826],
+    })
+    results = locate_parcels(
+        ["6 rue de Chanzy Paris 11e Arrondissement", "1 RUE INCONNUE PARIS"],
+        antennas, 'Orange', backend=backend
+    )
+
+    address, coords, closest, distance = results[0]
+    assert coords == pytest.approx((48.852222222222224, 2.3825))
+    assert closest == 1
+    assert 0 < distance < 1
+    assert results[1] == ("1 RUE INCONNUE PARIS", None, None, None)
@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+
+import numpy as np
+import pytest
+
+from tile_export import (
+    aggregate_grid, cluster_points, encode_properties, export_coverage_tiles,
+    export_point_tiles, geojson_features, tile_coordinates, TILE_PIXELS
+)
+
+def read_tile(path):
+    with gzip.open(path) as f:
+        return json.load(f)
+
+def tile_files(output_dir):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), output_dir)
+        for root, _, names in os.walk(output_dir) for name in names if name != 'manifest.json'
+    )
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    n = 2000
+    return (
+        rng.uniform(48.5, 49.0, n),
+        rng.uniform(2.0, 2.6, n),
+        {'support': np.arange(n), 'operator': rng.choice(['ORANGE', 'SFR', 'FREE MOBILE'], n)},
+    )
+
+def test_tile_coordinates_paris():
+    x, y, fx, fy = tile_coordinates(48.8566, 2.3522, 10)
+    assert (int(x), int(y)) == (518, 352)
+    assert 0 <= fx < 1 and 0 <= fy < 1
+
+def test_clusters_keep_counts_and_labels(points):
+    lat, lon, properties = points
+    columns, categories = encode_properties(properties)
+    cluster_lat, cluster_lon, clusters = cluster_points(lat, lon, columns, categories, 8, 16)
+
+    assert clusters['count'].sum() == len(lat)
+    assert clusters['operator_orange'].sum() == np.sum(properties['operator'] == 'ORANGE')
+    assert 'support' not in clusters
+
+    # No tile holds more clusters than it has cluster cells
+    x, y, _, _ = tile_coordinates(cluster_lat, cluster_lon, 8)
+    _, per_tile = np.unique(x * 256 + y, return_counts=True)
+    assert per_tile.max() <= (TILE_PIXELS // 16) ** 2
+
+def test_point_pyramid_levels_of_detail(points, tmp_path):
+    lat, lon, properties = points
+    export_point_tiles(lat, lon, properties, tmp_path, min_zoom=6, max_zoom=12, cluster_max_zoom=11)
+
+    low = [read_tile(tmp_path / name) for name in tile_files(tmp_path) if name.startswith('6/')]
+    high = [read_tile(tmp_path / name) for name in tile_files(tmp_path) if name.startswith('12/')]
+    assert sum(f['properties']['count'] for t in low for f in t['features']) == len(lat)
+    assert sum(len(t['features']) for t in low) < len(lat)
+    assert sum(len(t['features']) for t in high) == len(lat)
+
+def test_non_finite_values_are_null():
+    columns, categories = encode_properties({'distance': np.array([1.0, np.nan, np.inf, -np.inf])})
+    features = [json.loads(f) for f in geojson_features(np.zeros(4), np.zeros(4), columns, categories)]
+    assert [f['properties']['distance'] for f in features] == [1.0, None, None, None]
+
+def test_incremental_export(points, tmp_path):
+    lat, lon, properties = points
+    first = export_point_tiles(lat, lon, properties, tmp_path, min_zoom=8, max_zoom=10)
+    again = export_point_tiles(lat, lon, properties, tmp_path, min_zoom=8, max_zoom=10)
+    assert again == {'written': 0, 'unchanged': first['written'], 'removed': 0}
+
+    # Keeping only the northern points empties some tiles
+    north = lat > 48.8
+    subset = {name: values[north] for name, values in properties.items()}
+    counts = export_point_tiles(lat[north], lon[north], subset, tmp_path, min_zoom=8, max_zoom=10)
+    assert counts['removed'] > 0
+    manifest = json.loads((tmp_path / 'manifest.json').read_text())
+    assert tile_files(tmp_path) == sorted(name + '.geojson.gz' for name in manifest['tiles'])
+
+def test_format_change_removes_old_tiles(points, tmp_path):
+    lat, lon, properties = points
+    export_point_tiles(lat, lon, properties, tmp_path, min_zoom=8, max_zoom=9)
+    counts = export_point_tiles(lat, lon, properties, tmp_path, min_zoom=8, max_zoom=9, fmt='binary')
+
+    files = tile_files(tmp_path)
+    assert counts['removed'] == counts['written']
+    assert files and all(name.endswith('.bin.gz') for name in files)
+
+def test_aggregate_grid_blocks():
+    centers = (np.arange(3) + 0.5, np.arange(5) + 0.5)
+    bits = np.array([
+        [1, 0, 0, 2, 0],
+        [0, 0, 4, 0, 0],
+        [0, 8, 0, 0, 1],
+    ], dtype=np.uint8)
+    (lat, lon), merged = aggregate_grid(centers, bits, (2, 2), 0, np.bitwise_or)
+    np.testing.assert_allclose(lat, [1.0, 2.5])
+    np.testing.assert_allclose(lon, [1.0, 3.0, 4.5])
+    np.testing.assert_array_equal(merged, [[1, 6, 0], [8, 0, 1]])
+
+    distances = np.where(bits > 0, bits, np.nan).astype(float)[None]
+    _, nearest = aggregate_grid(centers, distances, (2, 2), np.nan, np.fmin)
+    np.testing.assert_array_equal(nearest[0], [[1, 2, np.nan], [8, np.nan, 1]])
+
+def test_coverage_tiles_downsample(tmp_path):
+    lat_centers = np.arange(48.0, 49.0, 0.01) + 0.005
+    lon_centers = np.arange(2.0, 3.0, 0.01) + 0.005
+    bits = np.ones((len(lat_centers), len(lon_centers)), dtype=np.uint8)
+    distances = np.full((1,) + bits.shape, 0.5)
+    distances[0, 0, 0] = np.inf
+    raster_path = tmp_path / 'rasters.npz'
+    np.savez(raster_path, operators=np.array(['ORANGE']), lat_centers=lat_centers, lon_centers=lon_centers,
+             distances=distances, coverage_bits=bits, coverage_radius_km=2.0)
+
+    output_dir = tmp_path / 'tiles'
+    export_coverage_tiles(raster_path, output_dir, min_zoom=5, max_zoom=12)
+    manifest = json.loads((output_dir / 'manifest.json').read_text())
+
+    def features(zoom):
+        return [f for name in tile_files(output_dir) if name.startswith(f'{zoom}/')
+                for f in read_tile(output_dir / name)['features']]
+
+    assert len(features(5)) < len(features(12)) == bits.size
+    assert manifest['cell_size']['12'] == pytest.approx([0.01, 0.01])
+    assert manifest['operators'] == ['ORANGE']
+    assert all(f['properties']['coverage_bits'] == 1 for f in features(5))
+    assert None in [f['properties']['distance_orange'] for f in features(12)]
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gaussian_kde
+
+import tiling
+from distances import geo_distance
+from tiling import check_backend, chunked_quantiles, tiled_kde, tiled_nearest_distances
+
+@pytest.fixture
+def antennas():
+    rng = np.random.default_rng(7)
+    n = 500
+    data = pd.DataFrame({
+        'Exploitant': rng.choice(['ORANGE', 'SFR'], n),
+        'Latitude': rng.uniform(47.0, 48.5, n),
+        'Longitude': rng.uniform(1.0, 3.0, n),
+    })
+    # Isolated antennas far from the halo, a duplicate and a lone operator
+    extra = pd.DataFrame({
+        'Exploitant': ['ORANGE', 'ORANGE', 'SFR', 'FREE MOBILE'],
+        'Latitude': [42.0, -21.1, data['Latitude'][0], 45.0],
+        'Longitude': [9.0, 55.5, data['Longitude'][0], 5.0],
+    })
+    extra.loc[2, 'Exploitant'] = data['Exploitant'][0]
+    return pd.concat([data, extra], ignore_index=True)
+
+def chunks(data, size=150):
+    return (data[start:start + size] for start in range(0, len(data), size))
+
+def brute_force_nearest(points):
+    distances = geo_distance(points[:, 0, None], points[:, 1, None], points[None, :, 0], points[None, :, 1])
+    np.fill_diagonal(distances, np.inf)
+    return distances.min(axis=1)
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Record the batches of tiles streamed by the workers."""
+    recorded = []
+    tile_batches = tiling.tile_batches
+
+    def spy(tiles, keys, max_points):
+        for batch in tile_batches(tiles, keys, max_points):
+            recorded.append(batch)
+            yield batch
+
+    monkeypatch.setattr(tiling, 'tile_batches', spy)
+    return recorded
+
+def test_nearest_matches_brute_force_under_tight_budget(antennas, batches):
+    # Around 60 points per worker forces the streamed pass beyond the halo
+    results = tiled_nearest_distances(chunks(antennas), tile_size=0.1, memory_budget_mb=0.01, max_workers=1)
+    assert batches
+
+    assert set(results) == {'ORANGE', 'SFR', 'FREE MOBILE'}
+    for operator, result in results.items():
+        points = antennas[antennas['Exploitant'] == operator][['Latitude', 'Longitude']].values
+        np.testing.assert_array_equal(result[:, :2], points)
+        np.testing.assert_allclose(result[:, 2], brute_force_nearest(points), rtol=1e-9, atol=1e-9)
+
+    assert results['FREE MOBILE'][0, 2] == np.inf
+    assert np.any(results[antennas['Exploitant'][0]][:, 2] == 0)
+
+def test_kde_matches_gaussian_kde_under_tight_budget(antennas, batches):
+    data = antennas[antennas['Exploitant'] == 'SFR']
+    data = data[data['Latitude'] > 46]
+    results = tiled_kde(chunks(data), tile_size=0.1, memory_budget_mb=0.01, max_workers=1)
+    assert len(batches) > len({tuple(batch[0]) for batch in batches})
+
+    xy = data[['Longitude', 'Latitude']].values.T
+    np.testing.assert_allclose(results['SFR'][:, 2], gaussian_kde(xy)(xy), rtol=1e-4)
+
+def test_results_spilled_and_work_dir_removed(antennas, tmp_path):
+    results = tiled_nearest_distances(antennas, tile_size=0.5, spill_dir=tmp_path, max_workers=1)
+
+    assert isinstance(results['ORANGE'], np.memmap)
+    assert sorted(os.listdir(tmp_path)) == ['free_mobile_nearest.npy', 'orange_nearest.npy', 'sfr_nearest.npy']
+
+def test_chunked_quantiles_matches_numpy():
+    rng = np.random.default_rng(1)
+    values = np.r_[rng.lognormal(0, 1, 20000), np.zeros(3000), np.inf, np.nan]
+    quantiles = [0, 0.05, 0.1, 0.25, 0.5, 0.75, 0.99, 1]
+
+    expected = np.quantile(values[np.isfinite(values)], quantiles)
+    found = chunked_quantiles(values, quantiles, block_rows=4096)
+    np.testing.assert_allclose(found, expected, rtol=5e-3)
+    assert found[1] == 0
+
+def test_chunked_quantiles_without_positive_values():
+    assert np.all(chunked_quantiles(np.zeros(10), [0.5, 1]) == 0)
+    assert np.all(np.isnan(chunked_quantiles(np.array([np.nan, np.inf]), [0.5])))
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        check_backend('dask')
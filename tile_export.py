@@ -0,0 +1,347 @@
+import os
+import json
+import gzip
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+TILE_FORMATS = ('geojson', 'binary')
+TILE_EXTENSIONS = {'geojson': '.geojson.gz', 'binary': '.bin.gz'}
+
+# Positions inside a tile are quantized to this many steps per axis in the binary format
+TILE_RESOLUTION = 65535
+
+# Width of a rendered tile in screen pixels
+TILE_PIXELS = 256
+
+def tile_coordinates(lat, lon, zoom):
+    """
+    Web Mercator (XYZ) tile indices of points at a zoom level.
+
+    Returns:
+        tuple: (x, y, fx, fy) where x, y are integer tile indices and fx, fy
+            the position inside the tile in [0, 1], y increasing southwards.
+    """
+    n = 2 ** zoom
+    lat = np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511)
+    tx = (np.asarray(lon, dtype=float) + 180) / 360 * n
+    ty = (1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n
+
+    x = np.clip(np.floor(tx), 0, n - 1).astype(np.int64)
+    y = np.clip(np.floor(ty), 0, n - 1).astype(np.int64)
+    return x, y, tx - x, ty - y
+
+def encode_properties(properties):
+    """
+    Split point properties into numeric arrays and categorical codes.
+
+    Returns:
+        tuple: (columns, categories) where columns maps names to numeric
+            arrays and categories maps categorical names to their labels.
+    """
+    columns = {}
+    categories = {}
+    for name, values in properties.items():
+        values = np.asarray(values)
+        if values.dtype.kind in 'OSU':
+            codes, labels = pd.factorize(values, sort=True)
+            columns[name] = codes.astype(np.min_scalar_type(max(len(labels) - 1, 0)))
+            categories[name] = [str(label) for label in labels]
+        else:
+            columns[name] = values
+    return columns, categories
+
+def pixel_size(zoom, lat):
+    """Size in degrees of (latitude, longitude) of one screen pixel at a zoom level and latitude."""
+    lon_size = 360 / (TILE_PIXELS * 2 ** zoom)
+    return lon_size * np.cos(np.radians(lat)), lon_size
+
+def cluster_points(lat, lon, columns, categories, zoom, cluster_pixels):
+    """
+    Merge the points falling in the same block of cluster_pixels x cluster_pixels screen pixels.
+
+    Each cluster sits at the centroid of its points and carries their count
+    and, for every categorical property, the count of each label as
+    '{name}_{label}'. Numeric properties are dropped.
+
+    Returns:
+        tuple: (lat, lon, columns) of the clusters.
+    """
+    x, y, fx, fy = tile_coordinates(lat, lon, zoom)
+    cells = TILE_PIXELS // cluster_pixels
+    cell_x = x * cells + np.minimum(np.floor(fx * cells), cells - 1).astype(np.int64)
+    cell_y = y * cells + np.minimum(np.floor(fy * cells), cells - 1).astype(np.int64)
+    _, cluster, counts = np.unique(cell_x * (2 ** zoom * cells) + cell_y, return_inverse=True, return_counts=True)
+
+    cluster_columns = {'count': counts.astype(np.uint32)}
+    for name, values in columns.items():
+        if name not in categories:
+            continue
+        labels = categories[name]
+        label_counts = np.bincount(
+            cluster * len(labels) + values, minlength=len(counts) * len(labels)
+        ).reshape(len(counts), len(labels))
+        for j, label in enumerate(labels):
+            cluster_columns[f'{name}_{label.lower().replace(" ", "_")}'] = label_counts[:, j].astype(np.uint32)
+
+    return (
+        np.bincount(cluster, weights=lat) / counts,
+        np.bincount(cluster, weights=lon) / counts,
+        cluster_columns
+    )
+
+def aggregate_grid(centers, values, block, fill, reduce):
+    """
+    Downsample a regular lat/lon grid by blocks of block[0] x block[1] cells.
+
+    centers: (lat_centers, lon_centers) of the grid cells.
+    values: Array whose last two axes are (lat, lon).
+    fill: Value padding incomplete blocks; must not change the reduction.
+    reduce: Ufunc combining the cells of a block (e.g. np.fmin, np.bitwise_or).
+
+    Returns:
+        tuple: ((lat_centers, lon_centers) of the blocks, aggregated values).
+    """
+    block_centers = []
+    for axis_centers, size in zip(centers, block):
+        groups = np.arange(len(axis_centers)) // size
+        block_centers.append(np.bincount(groups, weights=axis_centers) / np.bincount(groups))
+
+    # Pad to whole blocks, then reduce each block's cells at once
+    n_lat, n_lon = len(block_centers[0]), len(block_centers[1])
+    pad = [(0, 0)] * (values.ndim - 2) + [(0, n_lat * block[0] - values.shape[-2]), (0, n_lon * block[1] - values.shape[-1])]
+    padded = np.pad(values, pad, constant_values=fill)
+    blocks = padded.reshape(values.shape[:-2] + (n_lat, block[0], n_lon, block[1]))
+    return block_centers, reduce.reduce(reduce.reduce(blocks, axis=-1), axis=-2)
+
+def geojson_features(lat, lon, columns, categories):
+    """Encode every point as a GeoJSON feature string at once."""
+    features = (
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":['
+        + pd.Series(lon).map('{:.6f}'.format) + ','
+        + pd.Series(lat).map('{:.6f}'.format) + ']},"properties":{'
+    )
+    for i, (name, values) in enumerate(columns.items()):
+        if name in categories:
+            labels = np.array([json.dumps(label) for label in categories[name]], dtype=object)
+            encoded = pd.Series(labels[values])
+        elif values.dtype.kind == 'f':
+            # JSON has no NaN or Infinity
+            encoded = pd.Series(np.where(
+                np.isfinite(values), pd.Series(values).map('{:.3f}'.format), 'null'
+            ))
+        else:
+            encoded = pd.Series(values).astype(str)
+        features = features + (',' if i else '') + json.dumps(name) + ':' + encoded
+    return (features + '}}').values
+
+def binary_dtype(columns):
+    """Record layout of one point in a binary tile."""
+    return np.dtype(
+        [('x', '<u2'), ('y', '<u2')] +
+        [(name, values.dtype.newbyteorder('<')) for name, values in columns.items()]
+    )
+
+def write_tile_pyramid(layers, output_dir, fmt='geojson', categories=None, metadata=None):
+    """
+    Write per-zoom point layers as a gzip-compressed XYZ tile pyramid.
+
+    Tiles go to output_dir/{z}/{x}/{y}.geojson.gz (a FeatureCollection) or
+    output_dir/{z}/{x}/{y}.bin.gz (little-endian records described per zoom
+    in manifest.json, with positions quantized inside the tile). The manifest
+    also stores a hash per tile: tiles whose content is unchanged are not
+    rewritten and tiles that are no longer produced are removed, even when the
+    previous export used another format, so regeneration is incremental.
+
+    layers: {zoom: (lat, lon, columns)} where columns maps property names to
+        numeric arrays (categorical properties as codes).
+    categories: {name: labels} of the categorical columns.
+    metadata: Extra entries for the manifest.
+
+    Returns:
+        dict: {'written': n, 'unchanged': n, 'removed': n} tile counts.
+    """
+    if fmt not in TILE_FORMATS:
+        raise ValueError(f"Unknown tile format: {fmt}. Choose from {', '.join(TILE_FORMATS)}")
+
+    categories = categories or {}
+    extension = TILE_EXTENSIONS[fmt]
+
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    previous = {}
+    previous_extension = extension
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            old_manifest = json.load(f)
+        previous = old_manifest.get('tiles', {})
+        previous_extension = TILE_EXTENSIONS.get(old_manifest.get('format'), extension)
+
+    tiles = {}
+    fields = {}
+    counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+
+    for zoom, (lat, lon, columns) in sorted(layers.items()):
+        if len(lat) == 0:
+            continue
+        x, y, fx, fy = tile_coordinates(lat, lon, zoom)
+
+        # Sort points by tile so each tile is a contiguous slice
+        order = np.lexsort((y, x))
+        keys = np.stack([x[order], y[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        ends = np.r_[starts[1:], len(order)]
+
+        if fmt == 'geojson':
+            features = geojson_features(lat, lon, columns, categories)
+        else:
+            dtype = binary_dtype(columns)
+            fields[str(zoom)] = [[name, dtype.fields[name][0].str] for name in dtype.names]
+            records = np.empty(len(order), dtype=dtype)
+            records['x'] = np.round(fx[order] * TILE_RESOLUTION)
+            records['y'] = np.round(fy[order] * TILE_RESOLUTION)
+            for name, values in columns.items():
+                records[name] = values[order]
+
+        for start, end in zip(starts, ends):
+            tile_x, tile_y = keys[start]
+            if fmt == 'geojson':
+                content = (
+                    '{"type":"FeatureCollection","features":['
+                    + ','.join(features[order[start:end]]) + ']}'
+                ).encode()
+            else:
+                content = records[start:end].tobytes()
+
+            name = f'{zoom}/{tile_x}/{tile_y}'
+            digest = hashlib.sha1(content).hexdigest()
+            tiles[name] = digest
+
+            path = os.path.join(output_dir, name + extension)
+            if previous.get(name) == digest and previous_extension == extension and os.path.exists(path):
+                counts['unchanged'] += 1
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(gzip.compress(content, mtime=0))
+            counts['written'] += 1
+
+    # Drop tiles left over from the previous export, in its own format
+    for name in previous:
+        if name in tiles and previous_extension == extension:
+            continue
+        path = os.path.join(output_dir, name + previous_extension)
+        if os.path.exists(path):
+            os.remove(path)
+            counts['removed'] += 1
+
+    manifest = {
+        'format': fmt,
+        'min_zoom': min(layers, default=None),
+        'max_zoom': max(layers, default=None),
+        'categories': categories,
+        'tiles': tiles,
+    }
+    if fmt == 'binary':
+        manifest['resolution'] = TILE_RESOLUTION
+        manifest['fields'] = fields
+    manifest.update(metadata or {})
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    return counts
+
+def export_point_tiles(lat, lon, properties, output_dir, min_zoom=5, max_zoom=12, fmt='geojson',
+                       cluster_max_zoom=11, cluster_pixels=16):
+    """
+    Write points as a gzip-compressed XYZ tile pyramid (see write_tile_pyramid).
+
+    Up to cluster_max_zoom, points are merged into clusters of
+    cluster_pixels x cluster_pixels screen pixels (see cluster_points), so a
+    tile never holds more than (256 / cluster_pixels)² features. Deeper
+    zooms hold every point.
+
+    lat, lon: Point coordinates.
+    properties: Dict of per-point arrays; string arrays are stored as codes
+        with their labels listed in the manifest.
+    cluster_max_zoom: Deepest clustered zoom, or None to never cluster.
+
+    Returns:
+        dict: {'written': n, 'unchanged': n, 'removed': n} tile counts.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    columns, categories = encode_properties(properties)
+
+    layers = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        if cluster_max_zoom is not None and zoom <= cluster_max_zoom and len(lat):
+            layers[zoom] = cluster_points(lat, lon, columns, categories, zoom, cluster_pixels)
+        else:
+            layers[zoom] = (lat, lon, columns)
+
+    return write_tile_pyramid(layers, output_dir, fmt, categories, {
+        'bounds': [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())] if len(lat) else None,
+        'cluster_max_zoom': cluster_max_zoom,
+        'cluster_pixels': cluster_pixels,
+    })
+
+def export_antenna_tiles(data, output_dir='outputs/tiles/antennas', min_zoom=5, max_zoom=12, fmt='geojson',
+                         cluster_max_zoom=11):
+    """Export antenna locations with their support number and operator as a tile pyramid."""
+    return export_point_tiles(
+        data['Latitude'].values,
+        data['Longitude'].values,
+        {
+            'support': data['Numéro de support'].values,
+            'operator': data['Exploitant'].astype(str).values,
+        },
+        output_dir, min_zoom=min_zoom, max_zoom=max_zoom, fmt=fmt, cluster_max_zoom=cluster_max_zoom
+    )
+
+def export_coverage_tiles(raster_path='outputs/operator_coverage_rasters.npz', output_dir='outputs/tiles/coverage',
+                          min_zoom=5, max_zoom=12, fmt='geojson', cell_pixels=8):
+    """
+    Export the coverage grid from compare_operator_coverage as a tile pyramid.
+
+    At each zoom the grid is downsampled into blocks spanning at least
+    cell_pixels screen pixels: a block's coverage bitmask is the OR of its
+    cells' bitmasks and its distances the minimum over its cells. Each block
+    becomes a point at its center; the block size in degrees per zoom is
+    listed in the manifest as 'cell_size' so viewers can draw it.
+    """
+    rasters = np.load(raster_path)
+    lat_centers, lon_centers = rasters['lat_centers'], rasters['lon_centers']
+    operators = [str(operator) for operator in rasters['operators']]
+
+    # Grid spacing in degrees; a single row or column never needs merging
+    steps = [abs(centers[1] - centers[0]) if len(centers) > 1 else np.inf for centers in (lat_centers, lon_centers)]
+
+    layers = {}
+    cell_size = {}
+    for zoom in range(min_zoom, max_zoom + 1):
+        pixel = pixel_size(zoom, lat_centers.mean() if len(lat_centers) else 0.0)
+        block = [max(1, int(cell_pixels * size // step)) for size, step in zip(pixel, steps)]
+
+        centers, bits = aggregate_grid((lat_centers, lon_centers), rasters['coverage_bits'], block, 0, np.bitwise_or)
+        _, distances = aggregate_grid((lat_centers, lon_centers), rasters['distances'], block, np.nan, np.fmin)
+
+        columns = {'coverage_bits': bits.ravel()}
+        for operator, operator_distances in zip(operators, distances):
+            columns[f'distance_{operator.lower().replace(" ", "_")}'] = operator_distances.ravel()
+
+        grid_lon, grid_lat = np.meshgrid(centers[1], centers[0])
+        layers[zoom] = (grid_lat.ravel(), grid_lon.ravel(), columns)
+        cell_size[str(zoom)] = [float(b * step) if np.isfinite(step) else None for b, step in zip(block, steps)]
+
+    return write_tile_pyramid(layers, output_dir, fmt, metadata={
+        'bounds': [float(lon_centers.min()), float(lat_centers.min()),
+                   float(lon_centers.max()), float(lat_centers.max())] if rasters['coverage_bits'].size else None,
+        'cell_size': cell_size,
+        # Viewers need the operator order to decode the coverage bits
+        'operators': operators,
+        'coverage_radius_km': float(rasters['coverage_radius_km']),
+    })
@@ -0,0 +1,447 @@
+import os
+import math
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from distances import nearest_distances, unit_vectors, EARTH_RADIUS_KM, DEFAULT_METHOD
+
+KM_PER_DEGREE = np.radians(1) * EARTH_RADIUS_KM
+
+# Rough peak memory per point held by a worker (coordinates, unit vectors, KD-tree, results)
+BYTES_PER_POINT = 160
+
+# Gaussian kernels are truncated beyond this many standard deviations
+KDE_CUTOFF = 5.0
+
+BACKENDS = ('memory', 'tiled')
+
+# Rows read at a time when streaming over spilled results
+BLOCK_ROWS = 1000000
+
+def check_backend(backend):
+    """Raise ValueError for an unknown execution backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Choose from {', '.join(BACKENDS)}")
+
+def partition_points(chunks, tile_size, spill_dir):
+    """
+    Spill antenna points to disk, bucketed by operator and spatial tile.
+
+    chunks: A DataFrame or an iterable of DataFrames (e.g. from
+        pd.read_csv(..., chunksize=...)) with 'Exploitant', 'Latitude' and
+        'Longitude' columns. Only one chunk is held in memory at a time.
+    tile_size: Tile edge length in degrees.
+    spill_dir: Directory where the tile parts are written.
+
+    Returns:
+        dict: {operator: {(tile_lat, tile_lon): [(part path, point count)]}}.
+            Each part is an (n, 3) array of latitude, longitude and the
+            point's position within its operator.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+
+    index = {}
+    offsets = {}
+
+    for c, chunk in enumerate(chunks):
+        chunk = chunk[['Exploitant', 'Latitude', 'Longitude']].copy()
+        chunk['tile_lat'] = np.floor(chunk['Latitude'] / tile_size).astype(int)
+        chunk['tile_lon'] = np.floor(chunk['Longitude'] / tile_size).astype(int)
+
+        # Position of each point within its operator, continued across chunks
+        position = chunk.groupby('Exploitant').cumcount()
+        chunk['position'] = position + chunk['Exploitant'].map(offsets).fillna(0).astype(int)
+        for operator, count in chunk['Exploitant'].value_counts().items():
+            offsets[operator] = offsets.get(operator, 0) + count
+
+        values = chunk[['Latitude', 'Longitude', 'position']].values.astype(np.float64)
+        groups = chunk.groupby(['Exploitant', 'tile_lat', 'tile_lon']).indices
+        for (operator, tile_lat, tile_lon), rows in groups.items():
+            operator_dir = os.path.join(spill_dir, operator.lower().replace(" ", "_"))
+            os.makedirs(operator_dir, exist_ok=True)
+            path = os.path.join(operator_dir, f'{tile_lat}_{tile_lon}_{c}.npy')
+            np.save(path, values[rows])
+            index.setdefault(operator, {}).setdefault((tile_lat, tile_lon), []).append((path, len(rows)))
+
+    return index
+
+def tile_count(tiles):
+    """Total number of points in a tile index."""
+    return sum(n for parts in tiles.values() for _, n in parts)
+
+def neighbour_keys(tiles, key, halo_tiles):
+    """Keys of the non-empty tiles within halo_tiles of key, the key itself first."""
+    if (2 * halo_tiles + 1) ** 2 < len(tiles):
+        candidates = (
+            (key[0] + i, key[1] + j)
+            for i in range(-halo_tiles, halo_tiles + 1)
+            for j in range(-halo_tiles, halo_tiles + 1)
+        )
+        return [key] + [k for k in candidates if k != key and k in tiles]
+    return [key] + [
+        k for k in tiles
+        if k != key and abs(k[0] - key[0]) <= halo_tiles and abs(k[1] - key[1]) <= halo_tiles
+    ]
+
+def load_tiles(tiles, keys):
+    """Load all spilled parts of the given tiles as one (n, 3) array."""
+    parts = [np.load(path) for key in keys for path, _ in tiles.get(key, [])]
+    if not parts:
+        return np.empty((0, 3))
+    return np.concatenate(parts)
+
+def halo_radius_km(key, halo_tiles, tile_size):
+    """
+    Conservative distance from any point of a tile to the edge of its halo.
+
+    Longitude degrees shrink towards the poles, so the narrowest side of the
+    halo is used, with a 1% margin for the ellipsoid.
+    """
+    max_lat = max(abs(key[0] - halo_tiles), abs(key[0] + halo_tiles + 1)) * tile_size
+    cos_lat = np.cos(np.radians(min(max_lat, 90.0)))
+    return 0.99 * halo_tiles * tile_size * KM_PER_DEGREE * cos_lat
+
+def neighbourhood_size(tiles, keys):
+    """Number of points in the given tiles, from the index only."""
+    return sum(n for k in keys for _, n in tiles.get(k, []))
+
+def largest_neighbourhood(tiles, halo_tiles):
+    """Largest number of points any tile loads together with its halo."""
+    return max(
+        (neighbourhood_size(tiles, neighbour_keys(tiles, key, halo_tiles)) for key in tiles),
+        default=0
+    )
+
+def tile_batches(tiles, keys, max_points):
+    """
+    Group tiles into consecutive batches of at most max_points points.
+
+    A single tile larger than max_points forms a batch on its own.
+    """
+    batch = []
+    batch_points = 0
+    for k in keys:
+        n = neighbourhood_size(tiles, [k])
+        if batch and batch_points + n > max_points:
+            yield batch
+            batch, batch_points = [], 0
+        batch.append(k)
+        batch_points += n
+    if batch:
+        yield batch
+
+def workers_for_budget(tiles, halo_tiles, memory_budget_mb, max_workers=None):
+    """Number of parallel workers whose largest tiles fit in the memory budget."""
+    max_workers = max_workers or os.cpu_count() or 1
+    largest = largest_neighbourhood(tiles, halo_tiles) * BYTES_PER_POINT
+    if largest == 0:
+        return max_workers
+    return int(max(1, min(max_workers, memory_budget_mb * 1024 ** 2 // largest)))
+
+# Tile index shared by the tasks running in a worker process
+_worker_tiles = None
+
+def _set_worker_tiles(tiles):
+    global _worker_tiles
+    _worker_tiles = tiles
+
+def run_tiled(worker, tasks, tiles, n_workers):
+    """
+    Run worker over tasks, in parallel processes when n_workers > 1.
+
+    The tile index is sent once to each process rather than with every task.
+    """
+    if n_workers <= 1:
+        _set_worker_tiles(tiles)
+        return [worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_set_worker_tiles,
+                             initargs=(tiles,)) as executor:
+        return list(executor.map(worker, tasks, chunksize=max(1, len(tasks) // (4 * n_workers))))
+
+def gather_results(parts, total, output_path=None):
+    """
+    Scatter per-tile results into one (total, 3) array of latitude, longitude, value.
+
+    output_path: Where to spill the gathered array. When None the array is
+        kept in memory.
+
+    Returns:
+        numpy.ndarray: The gathered array, memmapped read-only when spilled.
+    """
+    if output_path is None:
+        result = np.empty((total, 3))
+    else:
+        result = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float64, shape=(total, 3))
+    result[:] = np.nan
+    for path in parts:
+        if path is None:
+            continue
+        tile_result = np.load(path)
+        result[tile_result[:, 0].astype(np.int64)] = tile_result[:, 1:]
+    if output_path is None:
+        return result
+    result.flush()
+    del result
+    return np.load(output_path, mmap_mode='r')
+
+def _search_batch(tiles, keys, key, core, pending, distances, method):
+    """Lower distances[pending] to the nearest point found in the given tiles."""
+    neighbourhood = load_tiles(tiles, keys)
+    tree = cKDTree(unit_vectors(neighbourhood[:, 0], neighbourhood[:, 1]))
+    # The core tile, when included, comes first, so index == pending is the point itself
+    found, _ = nearest_distances(
+        tree, neighbourhood[:, 0], neighbourhood[:, 1],
+        core[pending, 0], core[pending, 1], method=method,
+        exclude=pending if keys[0] == key else None
+    )
+    distances[pending] = np.minimum(distances[pending], found)
+
+def _nearest_tile(args):
+    """
+    Nearest other antenna for every point of one tile, within max_points in memory.
+
+    The halo is widened while the whole neighbourhood fits in max_points.
+    Points still unresolved after that are searched by streaming the remaining
+    tiles ring by ring, in batches of at most max_points, keeping a running
+    minimum and stopping once no closer tile can remain.
+    """
+    key, tile_size, halo_tiles, method, max_points, output_path = args
+    tiles = _worker_tiles
+    core = load_tiles(tiles, [key])
+
+    keys = np.array(list(tiles))
+    span = int(np.max(keys.max(axis=0) - keys.min(axis=0)))
+
+    distances = np.full(len(core), np.inf)
+    pending = np.arange(len(core))
+    searched = -1
+
+    # The core tile stays loaded alongside each neighbourhood
+    max_points = max(1, max_points - len(core))
+
+    # In-memory pass: widen the halo while the neighbourhood fits the budget
+    while len(pending) > 0 and searched < span:
+        neighbours = neighbour_keys(tiles, key, halo_tiles)
+        if neighbourhood_size(tiles, neighbours) > max_points:
+            break
+        _search_batch(tiles, neighbours, key, core, pending, distances, method)
+        searched = halo_tiles
+
+        # A neighbour further than the halo edge may hide a closer one outside it
+        pending = pending[distances[pending] > halo_radius_km(key, halo_tiles, tile_size)]
+        halo_tiles *= 2
+
+    # Streamed pass over the tiles beyond the searched halo, nearest rings first
+    if len(pending) > 0 and searched < span:
+        ring = {k: max(abs(k[0] - key[0]), abs(k[1] - key[1])) for k in tiles}
+        remaining = sorted((k for k in tiles if ring[k] > searched), key=ring.get)
+        for batch in tile_batches(tiles, remaining, max_points):
+            # Every point at least this far away is already final
+            pending = pending[distances[pending] > halo_radius_km(key, ring[batch[0]] - 1, tile_size)]
+            if len(pending) == 0:
+                break
+            _search_batch(tiles, batch, key, core, pending, distances, method)
+
+    np.save(output_path, np.column_stack([core[:, 2], core[:, 0], core[:, 1], distances]))
+    return output_path
+
+def tiled_nearest_distances(data, tile_size=0.5, halo_tiles=1, method=DEFAULT_METHOD,
+                            memory_budget_mb=1024, max_workers=None, spill_dir=None):
+    """
+    Distance from every antenna to the nearest other antenna of the same operator.
+
+    Antennas are partitioned into spatial tiles spilled to a temporary
+    directory. Each tile is processed with a halo of neighbouring tiles; points
+    whose nearest neighbour may lie outside the halo are retried with a wider
+    one, and then streamed over the remaining tiles once the halo no longer
+    fits in the worker's share of the memory budget.
+
+    data: A DataFrame or an iterable of DataFrame chunks (see partition_points).
+    tile_size: Tile edge length in degrees. A single tile must fit in memory.
+    halo_tiles: Initial halo width in tiles.
+    method: Distance accuracy ('haversine', 'ellipsoidal' or 'exact').
+    memory_budget_mb: Total memory the parallel workers may use.
+    max_workers: Upper bound on parallel processes (defaults to the CPU count).
+    spill_dir: Directory where the result arrays are kept as .npy files. When
+        None the results are returned in memory.
+
+    Returns:
+        dict: {operator: (n, 3) array of latitude, longitude and nearest
+            distance in km}, in the order the operator's antennas appear in
+            data. Antennas without any other antenna get inf.
+    """
+    if spill_dir is not None:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='antenna_tiles_', dir=spill_dir) as work_dir:
+        index = partition_points(data, tile_size, os.path.join(work_dir, 'points'))
+        parts_dir = os.path.join(work_dir, 'nearest')
+        os.makedirs(parts_dir)
+
+        for operator, tiles in index.items():
+            slug = operator.lower().replace(" ", "_")
+            # Each worker's share of the budget also bounds its widened halos
+            n_workers = workers_for_budget(tiles, halo_tiles, memory_budget_mb, max_workers)
+            max_points = int(max(1, memory_budget_mb * 1024 ** 2 // n_workers // BYTES_PER_POINT))
+            tasks = [
+                (key, tile_size, halo_tiles, method, max_points,
+                 os.path.join(parts_dir, f'{slug}_{key[0]}_{key[1]}.npy'))
+                for key in tiles
+            ]
+            parts = run_tiled(_nearest_tile, tasks, tiles, n_workers)
+            output_path = os.path.join(spill_dir, f'{slug}_nearest.npy') if spill_dir else None
+            results[operator] = gather_results(parts, tile_count(tiles), output_path)
+
+    return results
+
+def kernel_covariance(tiles):
+    """
+    Gaussian KDE kernel covariance (Scott's rule) of (longitude, latitude) points.
+
+    Matches scipy.stats.gaussian_kde, accumulating the moments one tile at a
+    time so that the points never need to be loaded together.
+    """
+    n = 0
+    total = np.zeros(2)
+    outer = np.zeros((2, 2))
+    for key in tiles:
+        xy = load_tiles(tiles, [key])[:, [1, 0]]
+        n += len(xy)
+        total += xy.sum(axis=0)
+        outer += xy.T @ xy
+
+    mean = total / n
+    covariance = (outer - n * np.outer(mean, mean)) / (n - 1)
+    scott_factor = n ** (-1 / 6)
+    return covariance * scott_factor ** 2, n
+
+def _kde_tile(args):
+    """
+    Gaussian kernel density at every point of one tile.
+
+    The kernel sum is additive, so neighbouring tiles are streamed in batches
+    of at most max_points and their contributions accumulated.
+    """
+    key, halo_tiles, whitening, norm, max_points, output_path = args
+    tiles = _worker_tiles
+    core = load_tiles(tiles, [key])
+
+    # In whitened coordinates the kernel is a unit Gaussian
+    core_w = core[:, [1, 0]] @ whitening.T
+    density = np.zeros(len(core))
+
+    # The core tile stays loaded alongside each batch
+    max_points = max(1, max_points - len(core))
+
+    for batch in tile_batches(tiles, neighbour_keys(tiles, key, halo_tiles), max_points):
+        neighbourhood = load_tiles(tiles, batch)
+        neighbourhood_tree = cKDTree(neighbourhood[:, [1, 0]] @ whitening.T)
+
+        # Each evaluated row may pair with every batch point (24 bytes per pair)
+        block_rows = int(max(1, max_points * BYTES_PER_POINT // (24 * len(neighbourhood))))
+        for start in range(0, len(core), block_rows):
+            block = core_w[start:start + block_rows]
+            pairs = cKDTree(block).sparse_distance_matrix(
+                neighbourhood_tree, KDE_CUTOFF, output_type='ndarray'
+            )
+            density[start:start + len(block)] += np.bincount(
+                pairs['i'], weights=np.exp(-0.5 * pairs['v'] ** 2), minlength=len(block)
+            )
+
+    np.save(output_path, np.column_stack([core[:, 2], core[:, 0], core[:, 1], density / norm]))
+    return output_path
+
+def tiled_kde(data, tile_size=0.5, memory_budget_mb=1024, max_workers=None, spill_dir=None):
+    """
+    Gaussian kernel density of each operator's antennas, evaluated at the antennas.
+
+    Out-of-core equivalent of gaussian_kde(xy)(xy) on (longitude, latitude):
+    the kernel is truncated at KDE_CUTOFF standard deviations so each tile
+    only needs the tiles within that distance instead of the full n x n
+    evaluation. Those tiles are streamed in batches that fit the worker's
+    share of the memory budget.
+
+    spill_dir: Directory where the result arrays are kept as .npy files. When
+        None the results are returned in memory.
+
+    Returns:
+        dict: {operator: (n, 3) array of latitude, longitude and density}, in
+            the order the operator's antennas appear in data.
+    """
+    if spill_dir is not None:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='antenna_tiles_', dir=spill_dir) as work_dir:
+        index = partition_points(data, tile_size, os.path.join(work_dir, 'points'))
+        parts_dir = os.path.join(work_dir, 'kde')
+        os.makedirs(parts_dir)
+
+        for operator, tiles in index.items():
+            slug = operator.lower().replace(" ", "_")
+            covariance, n = kernel_covariance(tiles)
+            whitening = np.linalg.inv(np.linalg.cholesky(covariance))
+            norm = n * 2 * np.pi * np.sqrt(np.linalg.det(covariance))
+
+            # The halo must hold the truncated kernel along its widest axis
+            kernel_extent = KDE_CUTOFF * np.sqrt(np.linalg.eigvalsh(covariance).max())
+            halo_tiles = max(1, math.ceil(kernel_extent / tile_size))
+
+            # Only one tile is held whole; the halo is streamed in batches
+            n_workers = workers_for_budget(tiles, 0, memory_budget_mb, max_workers)
+            max_points = int(max(1, memory_budget_mb * 1024 ** 2 // n_workers // BYTES_PER_POINT))
+
+            tasks = [
+                (key, halo_tiles, whitening, norm, max_points,
+                 os.path.join(parts_dir, f'{slug}_{key[0]}_{key[1]}.npy'))
+                for key in tiles
+            ]
+            parts = run_tiled(_kde_tile, tasks, tiles, n_workers)
+            output_path = os.path.join(spill_dir, f'{slug}_kde.npy') if spill_dir else None
+            results[operator] = gather_results(parts, n, output_path)
+
+    return results
+
+def chunked_quantiles(values, quantiles, bins=4096, block_rows=BLOCK_ROWS):
+    """
+    Approximate quantiles of the finite non-negative values of a large array.
+
+    Streams over the array twice (range, then a log-spaced histogram of the
+    positive values), so a memmapped array is never loaded at once. Zeros,
+    such as distances between duplicate antennas, are counted exactly. The
+    relative error is bounded by the histogram bin width.
+
+    Returns:
+        numpy.ndarray: One value per requested quantile (in [0, 1]).
+    """
+    low, high, zeros, count = np.inf, -np.inf, 0, 0
+    for start in range(0, len(values), block_rows):
+        block = np.asarray(values[start:start + block_rows])
+        block = block[np.isfinite(block) & (block >= 0)]
+        zeros += np.count_nonzero(block == 0)
+        block = block[block > 0]
+        if len(block):
+            low, high = min(low, block.min()), max(high, block.max())
+            count += len(block)
+    if zeros + count == 0:
+        return np.full(len(quantiles), np.nan)
+    if count == 0:
+        return np.zeros(len(quantiles))
+
+    edges = np.geomspace(low, high * (1 + 1e-12), bins + 1)
+    hist = np.zeros(bins)
+    for start in range(0, len(values), block_rows):
+        block = np.asarray(values[start:start + block_rows])
+        hist += np.histogram(block[np.isfinite(block) & (block > 0)], bins=edges)[0]
+
+    # Quantiles falling among the zeros are 0, the rest come from the histogram
+    quantiles = np.asarray(quantiles, dtype=float)
+    positive = (quantiles * (zeros + count) - zeros) / count
+    cumulative = np.cumsum(hist) / count
+    return np.where(positive > 0, np.interp(positive, np.r_[0, cumulative], edges), 0.0)